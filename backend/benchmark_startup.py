@@ -0,0 +1,58 @@
+"""Measure import-to-ready latency of the API server.
+
+Each run starts a fresh interpreter, imports `server` and enters the app
+lifespan (Mongo ping + index check), then reports the time until the app
+would start reporting ready. Requires MONGO_URL and DB_NAME, same as the server.
+
+    python benchmark_startup.py --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+CHILD_SCRIPT = """
+import asyncio, json, logging
+logging.disable(logging.CRITICAL)
+import server
+
+async def main():
+    async with server.lifespan(server.app):
+        print(json.dumps({"startup_ms": server.app.state.startup_ms}))
+
+asyncio.run(main())
+"""
+
+
+def run_once() -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"server startup failed (exit {result.returncode}):\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])["startup_ms"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server import-to-ready latency")
+    parser.add_argument("--runs", type=int, default=5, help="number of cold starts to measure")
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+
+    samples = [run_once() for _ in range(args.runs)]
+    print(f"runs:   {len(samples)}")
+    print(f"min:    {min(samples):.1f} ms")
+    print(f"median: {statistics.median(samples):.1f} ms")
+    print(f"max:    {max(samples):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Create the MongoDB indexes the API relies on.
+
+One-off migration: building indexes on populated collections can take a
+while and needs the createIndex privilege, so the server only checks for
+them at startup. Safe to re-run; existing indexes are left as they are.
+
+    python create_indexes.py
+"""
+import asyncio
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        for collection, keys in server.INDEXES.items():
+            for key in keys:
+                name = await db[collection].create_index(key)
+                print(f"{collection}: {name}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
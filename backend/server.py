@@ -1,38 +1,46 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from startup_timer import IMPORT_STARTED
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
+import time
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Coroutine, Set
 import uuid
 from datetime import datetime, timezone
 import jwt
 import bcrypt
 import asyncio
-import resend
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# motor 3.3 builds its classes at runtime, so mypy can't use them as types
+client: Any  # AsyncIOMotorClient, set in lifespan
+db: Any  # AsyncIOMotorDatabase, set in lifespan
 
 # JWT settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'splitwise-secret-key-2024')
 JWT_ALGORITHM = "HS256"
 
 # Resend settings
-resend.api_key = os.environ.get('RESEND_API_KEY', '')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
+EMAIL_SEND_TIMEOUT = float(os.environ.get('EMAIL_SEND_TIMEOUT', '5'))
+_resend = None
+
+# Lifecycle settings
+SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', '10'))
+READY_PING_TIMEOUT = float(os.environ.get('READY_PING_TIMEOUT', '2'))
+_ready_ping: Optional[asyncio.Future] = None
+_background_tasks: Set[asyncio.Task] = set()
 
-# Create the main app
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -119,10 +127,49 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# ============== BACKGROUND TASKS ==============
+
+def spawn_background(coro: Coroutine) -> asyncio.Task:
+    """Run a coroutine in the background and keep it alive until shutdown drain"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def drain_background_tasks(timeout: float) -> None:
+    """Wait for in-flight background tasks, cancelling any still running after timeout"""
+    if not _background_tasks:
+        return
+    logger.info(f"Draining {len(_background_tasks)} background task(s)")
+    done, pending = await asyncio.wait(set(_background_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"Cancelled {len(pending)} background task(s) after {timeout}s drain deadline")
+        await asyncio.gather(*pending, return_exceptions=True)
+
 # ============== EMAIL SERVICE ==============
 
+def get_resend():
+    """Import and configure the Resend client on first use; None if not configured"""
+    global _resend
+    api_key = os.environ.get('RESEND_API_KEY', '')
+    if not api_key:
+        return None
+    if _resend is None:
+        import resend
+        resend.api_key = api_key
+        # Sends run in worker threads that cancellation can't stop, so cap the
+        # HTTP timeout at the drain deadline to keep shutdown bounded
+        resend.default_http_client = resend.RequestsClient(
+            timeout=min(EMAIL_SEND_TIMEOUT, SHUTDOWN_DRAIN_TIMEOUT)
+        )
+        _resend = resend
+    return _resend
+
 async def send_expense_notification(expense: dict, group: dict, payer: dict, participants: List[dict]):
-    if not resend.api_key:
+    resend = get_resend()
+    if resend is None:
         logger.warning("Resend API key not configured, skipping email notification")
         return
     
@@ -158,7 +205,8 @@ async def send_expense_notification(expense: dict, group: dict, payer: dict, par
                 logger.error(f"Failed to send email to {participant['email']}: {e}")
 
 async def send_member_invitation(member_email: str, member_name: str, group: dict, inviter: dict):
-    if not resend.api_key:
+    resend = get_resend()
+    if resend is None:
         logger.warning("Resend API key not configured, skipping invitation email")
         return
     
@@ -329,7 +377,7 @@ async def add_member(group_id: str, data: GroupMemberAdd, current_user: dict = D
     await db.groups.update_one({"id": group_id}, {"$push": {"members": user["id"]}})
     
     # Send invitation email
-    asyncio.create_task(send_member_invitation(data.email, data.name, group, current_user))
+    spawn_background(send_member_invitation(data.email, data.name, group, current_user))
     
     return {
         "message": "Member added successfully and invitation email sent",
@@ -414,7 +462,7 @@ async def create_expense(data: ExpenseCreate, current_user: dict = Depends(get_c
     payer = await db.users.find_one({"id": data.paid_by}, {"_id": 0, "password": 0})
     participant_ids = [s["user_id"] for s in splits]
     participants = await db.users.find({"id": {"$in": participant_ids}}, {"_id": 0, "password": 0}).to_list(50)
-    asyncio.create_task(send_expense_notification(expense, group, payer, participants))
+    spawn_background(send_expense_notification(expense, group, payer, participants))
     
     # Return expense without _id
     return {
@@ -653,17 +701,97 @@ async def search_users(email: str, current_user: dict = Depends(get_current_user
 async def root():
     return {"message": "EqualSplit API - Expense Sharing Made Easy"}
 
-# Include router and middleware
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+async def ping_mongo(timeout: float) -> None:
+    """Ping MongoDB, sharing one in-flight ping so slow probes don't pile up executor threads"""
+    global _ready_ping
+    if _ready_ping is None or _ready_ping.done():
+        _ready_ping = asyncio.ensure_future(client.admin.command("ping"))
+        # Mark the result retrieved when a probe timed out before it finished
+        _ready_ping.add_done_callback(lambda f: f.cancelled() or f.exception())
+    await asyncio.wait_for(asyncio.shield(_ready_ping), timeout)
+
+@api_router.get("/ready")
+async def readiness(request: Request):
+    state = request.app.state
+    if not getattr(state, "ready", False):
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "starting"})
+    try:
+        await ping_mongo(READY_PING_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Readiness ping failed: {e!r}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "unavailable"})
+    return {"status": "ready", "startup_ms": state.startup_ms}
+
+# ============== LIFECYCLE ==============
+
+# Lookup indexes the routes rely on; created by create_indexes.py, checked at startup
+INDEXES: Dict[str, List[List[tuple]]] = {
+    "users": [[("id", 1)], [("email", 1)]],
+    "groups": [[("id", 1)], [("members", 1)]],
+    "expenses": [[("id", 1)], [("group_id", 1), ("created_at", -1)]],
+    "settlements": [[("group_id", 1), ("created_at", -1)]],
+}
+
+def _index_key(key) -> tuple:
+    return tuple((field, int(d) if isinstance(d, (int, float)) else d) for field, d in key)
+
+async def check_indexes() -> List[str]:
+    """Log and return the expected indexes that are missing; never builds them"""
+    missing = []
+    for collection, keys in INDEXES.items():
+        existing = await db[collection].index_information()
+        present = {_index_key(info["key"]) for info in existing.values()}
+        for key in keys:
+            if _index_key(key) not in present:
+                missing.append(f"{collection} {key}")
+    if missing:
+        logger.warning(f"Missing MongoDB indexes (run create_indexes.py): {', '.join(missing)}")
+    return missing
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    app.state.ready = False
+
+    client = AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '5')),
+    )
+    db = client[os.environ['DB_NAME']]
+
+    # Open the first connection and check indexes before accepting traffic;
+    # minPoolSize fills the rest of the pool in the background
+    step = "ping"
+    try:
+        await client.admin.command("ping")
+        step = "index check"
+        await check_indexes()
+    except Exception as e:
+        logger.error(f"MongoDB {step} failed during startup: {e}")
+        client.close()
+        raise
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+    app.state.startup_ms = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
+    app.state.ready = True
+    logger.info(f"Startup complete in {app.state.startup_ms} ms")
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        await drain_background_tasks(SHUTDOWN_DRAIN_TIMEOUT)
+        client.close()
+
+def create_app() -> FastAPI:
+    """Build the API app. Routes use the module-level Mongo client, so build one app per process."""
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
@@ -0,0 +1,4 @@
+"""Records when the server process began importing; imported first by server.py."""
+import time
+
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,245 @@
+import asyncio
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+
+class FakeMongo:
+    """Stands in for AsyncIOMotorClient, its database and its collections, recording calls"""
+
+    def __init__(self, ping_error=None, ping_delay=0, index_error=None, indexes=None):
+        self.ping_error = ping_error
+        self.ping_delay = ping_delay
+        self.index_error = index_error
+        self.indexes = indexes or {}
+        self.calls = []
+        self.admin = SimpleNamespace(command=self._command)
+
+    def __call__(self, url, **kwargs):
+        return self
+
+    def __getitem__(self, name):
+        self.collection = name
+        return self
+
+    async def _command(self, name):
+        self.calls.append(name)
+        await asyncio.sleep(self.ping_delay)
+        if self.ping_error:
+            raise self.ping_error
+        return {"ok": 1}
+
+    async def index_information(self):
+        self.calls.append(f"index_information {self.collection}")
+        if self.index_error:
+            raise self.index_error
+        return self.indexes.get(self.collection, {})
+
+    def close(self):
+        self.calls.append("close")
+
+
+def ready_request():
+    app = server.create_app()
+    app.state.ready = True
+    app.state.startup_ms = 123.4
+    return SimpleNamespace(app=app)
+
+
+def test_finished_tasks_are_removed_from_registry():
+    async def run():
+        task = server.spawn_background(asyncio.sleep(0))
+        assert task in server._background_tasks
+        await task
+        await asyncio.sleep(0)  # let the done callback run
+        return task
+
+    task = asyncio.run(run())
+    assert task not in server._background_tasks
+
+
+def test_drain_waits_for_tasks_within_deadline():
+    async def run():
+        task = server.spawn_background(asyncio.sleep(0.05, result="sent"))
+        await server.drain_background_tasks(timeout=1)
+        return task
+
+    task = asyncio.run(run())
+    assert task.done() and not task.cancelled()
+    assert task.result() == "sent"
+
+
+def test_drain_cancels_tasks_past_deadline():
+    async def run():
+        fast = server.spawn_background(asyncio.sleep(0))
+        slow = server.spawn_background(asyncio.sleep(10))
+        await server.drain_background_tasks(timeout=0.05)
+        return fast, slow
+
+    fast, slow = asyncio.run(run())
+    assert fast.done() and not fast.cancelled()
+    assert slow.cancelled()
+    assert not server._background_tasks
+
+
+def test_drain_with_no_tasks_returns_immediately():
+    asyncio.run(server.drain_background_tasks(timeout=0))
+
+
+def test_readiness_before_startup(monkeypatch):
+    monkeypatch.setattr(server, "client", FakeMongo(), raising=False)
+    request = SimpleNamespace(app=server.create_app())
+
+    response = asyncio.run(server.readiness(request))
+    assert response.status_code == 503
+
+
+def test_readiness_after_startup_pings_mongo(monkeypatch):
+    mongo = FakeMongo()
+    monkeypatch.setattr(server, "client", mongo, raising=False)
+    monkeypatch.setattr(server, "_ready_ping", None)
+    request = ready_request()
+
+    assert asyncio.run(server.readiness(request)) == {"status": "ready", "startup_ms": 123.4}
+    assert mongo.calls == ["ping"]
+
+
+def test_readiness_reports_unavailable_when_ping_fails(monkeypatch):
+    monkeypatch.setattr(server, "client", FakeMongo(ping_error=ConnectionError("down")), raising=False)
+    monkeypatch.setattr(server, "_ready_ping", None)
+
+    response = asyncio.run(server.readiness(ready_request()))
+    assert response.status_code == 503
+
+
+def test_readiness_reports_unavailable_when_ping_times_out(monkeypatch):
+    monkeypatch.setattr(server, "client", FakeMongo(ping_delay=5), raising=False)
+    monkeypatch.setattr(server, "_ready_ping", None)
+    monkeypatch.setattr(server, "READY_PING_TIMEOUT", 0.05)
+
+    started = time.perf_counter()
+    response = asyncio.run(server.readiness(ready_request()))
+    assert response.status_code == 503
+    assert time.perf_counter() - started < 1
+
+
+def test_shutdown_with_threaded_send_finishes_within_deadline(monkeypatch):
+    # A server that accepts the connection but never answers, like a stalled API
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    host, port = listener.getsockname()
+
+    monkeypatch.setenv("RESEND_API_KEY", "re_test")
+    monkeypatch.setattr(server, "_resend", None)
+    monkeypatch.setattr(server, "SHUTDOWN_DRAIN_TIMEOUT", 0.3)
+    monkeypatch.setattr(server, "EMAIL_SEND_TIMEOUT", 30)
+    resend = server.get_resend()
+    monkeypatch.setattr(resend, "api_url", f"http://{host}:{port}")
+
+    async def run():
+        group = {"name": "Trip"}
+        inviter = {"name": "Ana"}
+        server.spawn_background(server.send_member_invitation("bo@example.com", "Bo", group, inviter))
+        await asyncio.sleep(0.05)  # let the send reach its worker thread
+        await server.drain_background_tasks(server.SHUTDOWN_DRAIN_TIMEOUT)
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(run())  # also waits for the default executor's threads
+    finally:
+        listener.close()
+        monkeypatch.setattr(server, "_resend", None)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 2 * server.SHUTDOWN_DRAIN_TIMEOUT + 0.3
+
+
+def use_fake_mongo(monkeypatch, mongo):
+    monkeypatch.setenv("MONGO_URL", "mongodb://fake")
+    monkeypatch.setenv("DB_NAME", "test")
+    monkeypatch.setattr(server, "AsyncIOMotorClient", mongo)
+    # lifespan assigns these globals; restore them after the test
+    monkeypatch.setattr(server, "client", None, raising=False)
+    monkeypatch.setattr(server, "db", None, raising=False)
+
+
+def test_lifespan_pings_and_checks_indexes_before_ready(monkeypatch):
+    mongo = FakeMongo()
+    use_fake_mongo(monkeypatch, mongo)
+    app = server.create_app()
+
+    async def run():
+        async with server.lifespan(app):
+            assert app.state.ready
+            assert app.state.startup_ms > 0
+            return list(mongo.calls)
+
+    calls = asyncio.run(run())
+    assert calls == ["ping"] + [f"index_information {name}" for name in server.INDEXES]
+    assert mongo.calls[-1] == "close"
+    assert not app.state.ready
+
+
+def test_lifespan_drains_background_tasks_before_closing_client(monkeypatch):
+    mongo = FakeMongo()
+    use_fake_mongo(monkeypatch, mongo)
+
+    async def send():
+        await asyncio.sleep(0.05)
+        mongo.calls.append("email sent")
+
+    async def run():
+        async with server.lifespan(server.create_app()):
+            server.spawn_background(send())
+
+    asyncio.run(run())
+    assert mongo.calls[-2:] == ["email sent", "close"]
+
+
+def test_lifespan_closes_client_when_ping_fails(monkeypatch, caplog):
+    mongo = FakeMongo(ping_error=ConnectionError("down"))
+    use_fake_mongo(monkeypatch, mongo)
+    app = server.create_app()
+
+    async def run():
+        async with server.lifespan(app):
+            pass
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    assert mongo.calls == ["ping", "close"]
+    assert not app.state.ready
+    assert "MongoDB ping failed" in caplog.text
+
+
+def test_lifespan_closes_client_when_index_check_fails(monkeypatch, caplog):
+    mongo = FakeMongo(index_error=PermissionError("not authorized"))
+    use_fake_mongo(monkeypatch, mongo)
+    app = server.create_app()
+
+    async def run():
+        async with server.lifespan(app):
+            pass
+
+    with pytest.raises(PermissionError):
+        asyncio.run(run())
+    assert mongo.calls[-1] == "close"
+    assert not app.state.ready
+    assert "MongoDB index check failed" in caplog.text
+
+
+def test_check_indexes_reports_missing_indexes(monkeypatch):
+    indexes = {
+        name: {f"idx{i}": {"key": key} for i, key in enumerate(keys)}
+        for name, keys in server.INDEXES.items()
+    }
+    del indexes["settlements"]
+    monkeypatch.setattr(server, "db", FakeMongo(indexes=indexes), raising=False)
+
+    missing = asyncio.run(server.check_indexes())
+    assert missing == ["settlements [('group_id', 1), ('created_at', -1)]"]